@@ -0,0 +1,197 @@
+"""Compare run time, memory use and outputs of the pipeline configurations.
+
+Each configuration (NumPy or pyarrow backend; direct writes, staged synchronous
+writes or the output writer pool) runs the charts built from the raw parquet
+files in a separate process, writing its outputs to a temporary folder. The
+total build time, including committing the outputs, and the peak memory of each
+process are logged. The NumPy run writing straight into the output folder, as
+the charts did before the output writer, is the baseline: every run is timed
+against it and its outputs are checked against the baseline outputs.
+
+Run with `python -m scripts.analysis.benchmark` once the raw data is fetched.
+"""
+
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+import pandas as pd
+
+from scripts.analysis import charts
+from scripts.logger import logger
+from scripts.utils import set_pandas_options
+from scripts.writer import MANIFEST, OutputWriter
+
+
+class DirectWriter(OutputWriter):
+    """Writer that serialises each file straight into the output folder.
+
+    This reproduces the writes made by the charts before the output writer: no
+    staging, temporary files, hashing or manifest.
+    """
+
+    def __enter__(self) -> "DirectWriter":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        pass
+
+    def submit(self, name: str, serialise: Callable[[Path], None]) -> None:
+        """Write a file straight into the output folder"""
+
+        serialise(self.output / name)
+
+
+WRITERS: dict[str, Callable[[Path], OutputWriter]] = {
+    "direct": DirectWriter,
+    "staged": lambda output: OutputWriter(output, max_workers=0),
+    "pool": OutputWriter,
+}
+
+# run name: (dtype backend, writer), the first run is the baseline
+RUNS = {
+    "numpy, direct writes": ("numpy", "direct"),
+    "numpy, staged synchronous writes": ("numpy", "staged"),
+    "numpy, output writer pool": ("numpy", "pool"),
+    "pyarrow, direct writes": ("pyarrow", "direct"),
+    "pyarrow, output writer pool": ("pyarrow", "pool"),
+}
+
+
+def _run_charts(output: Path, writer_name: str) -> None:
+    """Run the charts in the current process and print the run statistics
+
+    Args:
+        output: Folder where the chart outputs are saved
+        writer_name: Writer to use, one of the WRITERS keys
+    """
+
+    set_pandas_options()
+
+    start = time.perf_counter()
+    with WRITERS[writer_name](output) as writer:
+        charts.chart_1(writer)
+        charts.chart_2(writer)
+        charts.chart_3(writer)
+        charts.chart_4(writer)
+    seconds = time.perf_counter() - start
+
+    # ru_maxrss is reported in kilobytes on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    print(json.dumps({"seconds": seconds, "peak_mb": peak_mb}))
+
+
+def _run_config(backend: str, writer_name: str, output: Path) -> dict[str, float]:
+    """Run the charts with a given configuration in a new process
+
+    Args:
+        backend: dtype backend to use, either "numpy" or "pyarrow"
+        writer_name: Writer to use, one of the WRITERS keys
+        output: Folder where the chart outputs are saved
+
+    Returns:
+        A dictionary with the run time in seconds and the peak memory in MB
+    """
+
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "scripts.analysis.benchmark",
+            "--worker",
+            str(output),
+            writer_name,
+        ],
+        env={**os.environ, "DEBT_OVERVIEW_DTYPE_BACKEND": backend},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def check_parity(expected: Path, result: Path) -> list[str]:
+    """Compare the outputs of two runs
+
+    CSV files are compared as DataFrames and JSON files as parsed objects so
+    that dtype specific formatting does not count as a difference. The run
+    manifest is skipped as it records the time of the run.
+
+    Args:
+        expected: Folder with the outputs of the reference run
+        result: Folder with the outputs of the run to check
+
+    Returns:
+        A list of the files that differ between the two runs
+    """
+
+    mismatches = []
+
+    for path in sorted(expected.iterdir()):
+        if path.name == MANIFEST:
+            continue
+
+        other = result / path.name
+
+        if not other.exists():
+            mismatches.append(path.name)
+            continue
+
+        if path.suffix == ".csv":
+            try:
+                pd.testing.assert_frame_equal(pd.read_csv(path), pd.read_csv(other))
+            except AssertionError:
+                mismatches.append(path.name)
+
+        elif path.suffix == ".json" and json.loads(path.read_text()) != json.loads(
+            other.read_text()
+        ):
+            mismatches.append(path.name)
+
+    return mismatches
+
+
+def main() -> None:
+    """Run the benchmark for all configurations and check the outputs match"""
+
+    with tempfile.TemporaryDirectory() as tmp:
+        outputs = {}
+        baseline = None
+
+        for i, (name, (backend, writer_name)) in enumerate(RUNS.items()):
+            outputs[name] = Path(tmp) / str(i)
+            outputs[name].mkdir()
+            stats = _run_config(backend, writer_name, outputs[name])
+            baseline = baseline or stats["seconds"]
+            logger.info(
+                f"{name}: {stats['seconds']:.2f} seconds "
+                f"({baseline / stats['seconds']:.2f}x baseline), "
+                f"{stats['peak_mb']:.0f} MB peak memory"
+            )
+
+        reference, *others = outputs.values()
+        mismatches = {
+            name: files
+            for name, output in zip(list(RUNS)[1:], others, strict=True)
+            if (files := check_parity(reference, output))
+        }
+
+    if mismatches:
+        raise ValueError(f"Outputs differ from the baseline run: {mismatches}")
+
+    logger.info("Outputs match across all runs")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--worker":
+        _run_charts(Path(sys.argv[2]), sys.argv[3])
+    else:
+        main()
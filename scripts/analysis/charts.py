@@ -1,34 +1,36 @@
 """Module for chart creation"""
 
-import json
 from datetime import datetime
+from functools import cache
 
 import pandas as pd
 from bblocks import places
-from bblocks.data_importers import InternationalDebtStatistics, get_dsa
+from bblocks.data_importers import get_dsa
 
+from scripts.analysis.get_raw_data import DEBT_GNI_INDICATOR
 from scripts.config import Paths
 from scripts.logger import logger
-from scripts.utils import custom_sort
+from scripts.utils import custom_sort, read_parquet, set_pandas_options, y_values
+from scripts.writer import OutputWriter
 
 LATEST_YEAR = 2024
 START_YEAR = 2000
 NUM_EST_YEARS = 6  # number of estimated years in debt service data
 
 
-def chart_1() -> None:
+def chart_1(writer: OutputWriter) -> None:
     """Chart 1: Bar debt stocks
 
     Bar chart, debt stocks over time for debtors and creditors, broken down by debt type
     (bilateral, multilateral, bonds, commercial banks, other private)
     """
 
-    df = pd.read_parquet(Paths.raw_data / "ids_debt_stocks.parquet")
+    df = read_parquet(Paths.raw_data / "ids_debt_stocks.parquet")
 
     # Basic cleaning
     df = (
         df.loc[
-            lambda d: d.year >= START_YEAR,
+            lambda d: (d.year >= START_YEAR) & (d.indicator_code != DEBT_GNI_INDICATOR),
             [
                 "indicator_name",
                 "indicator_code",
@@ -50,7 +52,7 @@ def chart_1() -> None:
     )
 
     # export data for download
-    df.to_csv(Paths.output / "chart_1_download.csv", index=False)
+    writer.to_csv(df, "chart_1_download.csv")
 
     # Chart data
 
@@ -85,11 +87,11 @@ def chart_1() -> None:
     )
 
     # export chart data
-    df.to_csv(Paths.output / "chart_1_chart.csv", index=False)
+    writer.to_csv(df, "chart_1_chart.csv")
 
     # create json data for chart
 
-    (
+    writer.to_json(
         df.rename(
             columns={
                 "debtor_name": "filter1_values",
@@ -102,11 +104,9 @@ def chart_1() -> None:
                 "other private": "y5",
             }
         )
-        .assign(y_values=lambda d: d[["y1", "y2", "y3", "y4", "y5"]].values.tolist())
-        .loc[:, ["filter1_values", "x_values", "filter2_values", "y_values"]]
-        .to_json(
-            Paths.output / "chart_1_chart.json", orient="records", date_format="iso"
-        )
+        .assign(y_values=lambda d: y_values(d, ["y1", "y2", "y3", "y4", "y5"]))
+        .loc[:, ["filter1_values", "x_values", "filter2_values", "y_values"]],
+        "chart_1_chart.json",
     )
 
     logger.info("Chart 1 created successfully")
@@ -128,7 +128,7 @@ def _get_debt_service_data() -> pd.DataFrame:
         "DT.INT.PROP.CD": {"category": "other private", "type": "interest"},
     }
 
-    df = pd.read_parquet(Paths.raw_data / "ids_debt_service.parquet")
+    df = read_parquet(Paths.raw_data / "ids_debt_service.parquet")
 
     return (
         df.loc[
@@ -152,20 +152,25 @@ def _get_debt_service_data() -> pd.DataFrame:
             columns={"entity_name": "debtor_name", "counterpart_name": "creditor_name"}
         )
         .reset_index(drop=True)
+        # map returns object columns, cast back so that Arrow types are kept
         .assign(
-            category=lambda d: d.indicator_code.map(lambda x: mapping[x]["category"]),
-            type=lambda d: d.indicator_code.map(lambda x: mapping[x]["type"]),
+            category=lambda d: d.indicator_code.map(
+                {k: v["category"] for k, v in mapping.items()}
+            ).astype(d.indicator_code.dtype),
+            type=lambda d: d.indicator_code.map(
+                {k: v["type"] for k, v in mapping.items()}
+            ).astype(d.indicator_code.dtype),
         )
     )
 
 
-def chart_2() -> None:
+def chart_2(writer: OutputWriter) -> None:
     """Chart 2: Bar total debt service"""
 
     df = _get_debt_service_data()
 
     # export data for download
-    df.to_csv(Paths.output / "chart_2_download.csv", index=False)
+    writer.to_csv(df, "chart_2_download.csv")
 
     # Chart data
 
@@ -194,11 +199,11 @@ def chart_2() -> None:
     )
 
     # export chart data
-    df.to_csv(Paths.output / "chart_2_chart.csv", index=False)
+    writer.to_csv(df, "chart_2_chart.csv")
 
     # json chart data
 
-    (
+    writer.to_json(
         df.rename(
             columns={
                 "debtor_name": "filter1_values",
@@ -211,17 +216,15 @@ def chart_2() -> None:
                 "other private": "y5",
             }
         )
-        .assign(y_values=lambda d: d[["y1", "y2", "y3", "y4", "y5"]].values.tolist())
-        .loc[:, ["filter1_values", "x_values", "filter2_values", "y_values"]]
-        .to_json(
-            Paths.output / "chart_2_chart.json", orient="records", date_format="iso"
-        )
+        .assign(y_values=lambda d: y_values(d, ["y1", "y2", "y3", "y4", "y5"]))
+        .loc[:, ["filter1_values", "x_values", "filter2_values", "y_values"]],
+        "chart_2_chart.json",
     )
 
     logger.info("Chart 2 created successfully")
 
 
-def chart_3() -> None:
+def chart_3(writer: OutputWriter) -> None:
     """Chart 3: Currency composition of debt"""
 
     indicators = {
@@ -233,14 +236,14 @@ def chart_3() -> None:
         # 'DT.CUR.MULC.ZS': 'Multiple currencies'
     }
 
-    df = pd.read_parquet(Paths.raw_data / "ids_currency_composition.parquet")
+    df = read_parquet(Paths.raw_data / "ids_currency_composition.parquet")
 
     df = df.loc[
         lambda d: (d.value.notna()) & (d.counterpart_name == "World") & (d.year >= 2001)
     ]
 
     # export data for download
-    df.to_csv(Paths.output / "chart_3_download.csv", index=False)
+    writer.to_csv(df, "chart_3_download.csv")
 
     # chart data
     df = (
@@ -261,17 +264,17 @@ def chart_3() -> None:
         .pipe(custom_sort, {"entity_name": "Low & middle income"})
     )
 
-    df.to_csv(Paths.output / "chart_3_chart.csv", index=False)
+    writer.to_csv(df, "chart_3_chart.csv")
     logger.info("Chart 3 created successfully")
 
 
-def chart_4() -> None:
+def chart_4(writer: OutputWriter) -> None:
     """Chart 4: Debt service broken down by interest and principal"""
 
     df = _get_debt_service_data()
 
     # export data for download
-    df.to_csv(Paths.output / "chart_4_download.csv", index=False)
+    writer.to_csv(df, "chart_4_download.csv")
 
     # chart data
 
@@ -301,10 +304,10 @@ def chart_4() -> None:
         .loc[:, ["debtor_name", "year", "creditor_name", "interest", "principal"]]
     )
 
-    df.to_csv(Paths.output / "chart_4_chart.csv", index=False)
+    writer.to_csv(df, "chart_4_chart.csv")
 
     # json chart data
-    (
+    writer.to_json(
         df.rename(
             columns={
                 "debtor_name": "filter1_values",
@@ -314,17 +317,22 @@ def chart_4() -> None:
                 "interest": "y2",
             }
         )
-        .assign(y_values=lambda d: d[["y1", "y2"]].values.tolist())
-        .loc[:, ["filter1_values", "x_values", "filter2_values", "y_values"]]
-        .to_json(
-            Paths.output / "chart_4_chart.json", orient="records", date_format="iso"
-        )
+        .assign(y_values=lambda d: y_values(d, ["y1", "y2"]))
+        .loc[:, ["filter1_values", "x_values", "filter2_values", "y_values"]],
+        "chart_4_chart.json",
     )
 
     logger.info("Chart 4 created successfully")
 
 
-def chart_5() -> None:
+@cache
+def _get_dsa_data() -> pd.DataFrame:
+    """Helper function to fetch the DSA data once per run"""
+
+    return get_dsa()
+
+
+def chart_5(writer: OutputWriter) -> None:
     """Chart 5: DSA map"""
 
     color_map = {
@@ -335,7 +343,7 @@ def chart_5() -> None:
     }
 
     # fetch DSA data
-    df = get_dsa()
+    df = _get_dsa_data()
 
     df = (
         df.loc[
@@ -360,91 +368,120 @@ def chart_5() -> None:
     )
 
     # export data for download
-    df.to_csv(Paths.output / "chart_5_download.csv", index=False)
+    writer.to_csv(df, "chart_5_download.csv")
 
     # chart
     df = df.assign(color=lambda d: d.risk_of_debt_distress.map(color_map))
 
-    df.to_csv(Paths.output / "chart_5_chart.csv", index=False)
+    writer.to_csv(df, "chart_5_chart.csv")
 
     logger.info("Chart 5 created successfully")
 
 
-def key_stats() -> None:
-    """Key statistics"""
+def key_stats(writer: OutputWriter) -> None:
+    """Key statistics
 
-    stats_dict = {}
+    Headline metrics for Low & middle income countries are computed for every year
+    from START_YEAR to LATEST_YEAR in one grouped pass over the raw data, and saved
+    as a history table for trend sparklines. The latest year is saved to
+    key_stats.json.
 
-    # debt GNI ratio
-    val = (
-        InternationalDebtStatistics()
-        .get_data(
-            "DT.DOD.DECT.GN.ZS",
-            entity_code="LMY",
-            start_year=LATEST_YEAR,
-            end_year=LATEST_YEAR,
-        )
-        .loc[lambda d: d.counterpart_code == "WLD", "value"]
-        .values[0]
-    )
+    DSA risk ratings are a current snapshot, so the number of countries in debt
+    distress is only available for the latest year.
+    """
 
-    stats_dict["debt_gni"] = f"{round(val, 2)}%"
+    lmy_filters = [
+        ("entity_code", "==", "LMY"),
+        ("counterpart_code", "==", "WLD"),
+        ("year", ">=", START_YEAR),
+        ("year", "<=", LATEST_YEAR),
+    ]
+    columns = ["indicator_code", "year", "value"]
 
-    # total debt stock
-    val = (
-        pd.read_parquet(Paths.raw_data / "ids_debt_stocks.parquet")
-        .loc[
-            lambda d: (d.entity_code == "LMY")
-            & (d.counterpart_code == "WLD")
-            & (d.year == LATEST_YEAR)
-        ]
-        .value.sum()
-        / 1_000_000_000_000
+    stocks = read_parquet(
+        Paths.raw_data / "ids_debt_stocks.parquet",
+        columns=columns,
+        filters=lmy_filters,
     )
-    stats_dict["debt_stock_total"] = f"US${round(val, 2)} trillion"
-
-    # total debt service
-    val = (
-        _get_debt_service_data()
-        .loc[
-            lambda d: (d.debtor_name == "Low & middle income")
-            & (d.creditor_name == "All creditors")
-            & (d.year == LATEST_YEAR)
-        ]
-        .value.sum()
-        / 1_000_000_000
+    service = read_parquet(
+        Paths.raw_data / "ids_debt_service.parquet",
+        columns=columns,
+        filters=lmy_filters,
     )
 
-    stats_dict["debt_service_total"] = f"US${round(val, 2)} billion"
+    history = (
+        pd.concat(
+            [
+                stocks.assign(
+                    metric=lambda d: d.indicator_code.eq(DEBT_GNI_INDICATOR).map(
+                        {True: "debt_gni", False: "debt_stock_total"}
+                    )
+                ),
+                service.assign(metric="debt_service_total"),
+            ],
+            ignore_index=True,
+        )
+        .groupby(["year", "metric"])["value"]
+        .sum(min_count=1)
+        .unstack("metric")
+        .reindex(
+            index=range(START_YEAR, LATEST_YEAR + 1),
+            columns=["debt_gni", "debt_stock_total", "debt_service_total"],
+        )
+        .rename_axis(index="year", columns=None)
+        .assign(
+            debt_stock_total=lambda d: d.debt_stock_total / 1_000_000_000_000,
+            debt_service_total=lambda d: d.debt_service_total / 1_000_000_000,
+        )
+    )
 
     # countries in debt distress
-    val = len(
-        get_dsa().loc[
-            lambda d: d.risk_of_debt_distress.isin(["In debt distress", "High"])
-        ]
+    history["countries_debt_distress"] = pd.Series(
+        {
+            LATEST_YEAR: len(
+                _get_dsa_data().loc[
+                    lambda d: d.risk_of_debt_distress.isin(["In debt distress", "High"])
+                ]
+            )
+        },
+        dtype="Int64",
     )
 
-    stats_dict["countries_debt_distress"] = val
+    history = history.reset_index()
 
-    stats_dict["latest_year"] = LATEST_YEAR  # latest year of data
+    # export history table
+    writer.to_csv(history, "key_stats_history.csv")
+    writer.to_json(history, "key_stats_history.json")
 
-    with open(Paths.output / "key_stats.json", "w") as f:
-        json.dump(stats_dict, f)
+    # latest year key statistics
+    latest = history.loc[lambda d: d.year == LATEST_YEAR].iloc[0]
 
+    missing = [metric for metric, val in latest.items() if pd.isna(val)]
+    if missing:
+        raise ValueError(f"Missing key statistics for {LATEST_YEAR}: {missing}")
 
-def last_update() -> None:
+    stats_dict = {
+        "debt_gni": f"{round(latest.debt_gni, 2)}%",
+        "debt_stock_total": f"US${round(latest.debt_stock_total, 2)} trillion",
+        "debt_service_total": f"US${round(latest.debt_service_total, 2)} billion",
+        "countries_debt_distress": int(latest.countries_debt_distress),
+        "latest_year": LATEST_YEAR,  # latest year of data
+    }
+
+    writer.dump_json(stats_dict, "key_stats.json")
+
+    logger.info("Key statistics created successfully")
+
+
+def last_update(writer: OutputWriter) -> None:
     """Set the last update date for the analysis
     in the key_stats.json file without overriding other kv pairs
     """
 
-    with open(Paths.output / "key_stats.json", "r+") as f:
-        key_stats_dict = json.load(f)
-        key_stats_dict["last_data_update"] = datetime.now().strftime("%d %B %Y")
+    key_stats_dict = writer.read_json("key_stats.json")
+    key_stats_dict["last_data_update"] = datetime.now().strftime("%d %B %Y")
 
-        # replace the file content
-        f.seek(0)
-        json.dump(key_stats_dict, f)
-        f.truncate()
+    writer.dump_json(key_stats_dict, "key_stats.json")
 
     logger.info("Updated last data update date")
 
@@ -452,12 +489,15 @@ def last_update() -> None:
 if __name__ == "__main__":
     logger.info("Running charts and key statistics")
 
-    chart_1()  # debt stocks chart
-    chart_2()  # total debt service chart
-    chart_3()  # debt composition chart
-    chart_4()  # debt service by interest and principal chart
-    chart_5()  # DSA map chart
-    key_stats()  # key statistics
-    last_update()  # last update date
+    set_pandas_options()
+
+    with OutputWriter() as writer:
+        chart_1(writer)  # debt stocks chart
+        chart_2(writer)  # total debt service chart
+        chart_3(writer)  # debt composition chart
+        chart_4(writer)  # debt service by interest and principal chart
+        chart_5(writer)  # DSA map chart
+        key_stats(writer)  # key statistics
+        last_update(writer)  # last update date
 
     logger.info("Successfully created all charts")
@@ -1,5 +1,6 @@
 """Get raw data and save to raw_data directory."""
 
+import pandas as pd
 from bblocks.data_importers import InternationalDebtStatistics
 
 from scripts.config import Paths
@@ -7,19 +8,29 @@ from scripts.logger import logger
 from scripts.utils import add_africa_values, timeout_30min
 
 START_YEAR = 2000
+DEBT_GNI_INDICATOR = "DT.DOD.DECT.GN.ZS"  # external debt stocks (% of GNI)
 
 
 @timeout_30min
 def get_debt_stocks_data() -> None:
-    """Get the raw data for the International Debt Statistics."""
+    """Get the raw data for the International Debt Statistics.
+
+    The debt to GNI ratio used in the key statistics is fetched in the same request.
+    """
 
     ids = InternationalDebtStatistics()
     inds = list(ids.debt_stock_indicators.indicator_code.unique())
 
-    df = ids.get_data(inds, include_labels=True, start_year=START_YEAR)
+    df = ids.get_data(
+        [*inds, DEBT_GNI_INDICATOR], include_labels=True, start_year=START_YEAR
+    )
 
-    # add Africa values
-    df = add_africa_values(df, agg_operation="sum")
+    # add Africa values (ratios can't be summed so the debt to GNI ratio is excluded)
+    gni_mask = df.indicator_code == DEBT_GNI_INDICATOR
+    df = pd.concat(
+        [add_africa_values(df.loc[~gni_mask], agg_operation="sum"), df.loc[gni_mask]],
+        ignore_index=True,
+    )
 
     df.to_parquet(Paths.raw_data / "ids_debt_stocks.parquet", index=False)
 
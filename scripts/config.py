@@ -1,5 +1,6 @@
 """Project configuration and paths."""
 
+import os
 from pathlib import Path
 
 
@@ -12,6 +13,16 @@ class Paths:
     scripts = project / "scripts"
 
 
+class Settings:
+    """Class to store the pipeline settings."""
+
+    # pandas dtype backend used to read the raw data, either "numpy" or "pyarrow"
+    dtype_backend = os.environ.get("DEBT_OVERVIEW_DTYPE_BACKEND", "numpy")
+
+
+if Settings.dtype_backend not in ("numpy", "pyarrow"):
+    raise ValueError(f"Invalid dtype backend: {Settings.dtype_backend}")
+
 # Ensure directories exist
 Paths.raw_data.mkdir(exist_ok=True)
 Paths.output.mkdir(exist_ok=True)
@@ -2,11 +2,45 @@
 
 import signal
 from collections.abc import Callable
+from pathlib import Path
 from typing import Any
 
 import pandas as pd
 from bblocks import places
 
+from scripts.config import Settings
+
+
+def set_pandas_options() -> None:
+    """Set the pandas options for the pipeline.
+
+    When running on the pyarrow backend, copy-on-write is enabled so that
+    intermediate DataFrames share their Arrow buffers instead of copying them.
+    Copy-on-write is always enabled from pandas 3.0 onwards.
+    """
+
+    if Settings.dtype_backend == "pyarrow" and int(pd.__version__.split(".")[0]) < 3:
+        pd.set_option("mode.copy_on_write", True)
+
+
+def read_parquet(path: Path, **kwargs: Any) -> pd.DataFrame:
+    """Read a parquet file using the configured dtype backend
+
+    Args:
+        path: Path to the parquet file
+        **kwargs: Additional arguments passed to pd.read_parquet, e.g. columns
+            or filters
+
+    Returns:
+        A DataFrame with NumPy backed columns, or Arrow backed columns if the
+        pyarrow backend is selected
+    """
+
+    if Settings.dtype_backend == "pyarrow":
+        return pd.read_parquet(path, dtype_backend="pyarrow", **kwargs)
+
+    return pd.read_parquet(path, **kwargs)
+
 
 def custom_sort(
     df: pd.DataFrame, resort_dict: dict[str, list[str] | str]
@@ -23,29 +57,46 @@ def custom_sort(
         A resorted DataFrame
     """
 
-    # create a copy of df
+    # convert all values to list without modifying the passed dictionary
+    resort_dict = {k: [v] if isinstance(v, str) else v for k, v in resort_dict.items()}
 
-    _df = df.copy(deep=True)
+    # check if all passed columns exist
+    for k in resort_dict:
+        if k not in list(df.columns):
+            raise ValueError(f"Column not found: {k}")
 
-    # convert all values to list
-    for k, v in resort_dict.items():
-        if isinstance(v, str):
-            resort_dict[k] = [resort_dict[k]]
+    # position of each value in the sort order of its column
+    order = {
+        col: {
+            val: i
+            for i, val in enumerate(
+                values + sorted(val for val in df[col].unique() if val not in values)
+            )
+        }
+        for col, values in resort_dict.items()
+    }
 
-        # check if all passed columns exist
-        if k not in list(_df.columns):
-            raise ValueError(f"Column not found: {k}")
+    # sort on the positions so that the columns keep their original dtypes
+    return df.sort_values(
+        list(resort_dict.keys()), key=lambda s: s.map(order[s.name]), kind="stable"
+    )
 
-    for col, values in resort_dict.items():
-        _df[col] = pd.Categorical(
-            _df[col],
-            categories=values
-            + sorted(val for val in _df[col].unique() if val not in values),
-            ordered=True,
-        )
 
-    _df = _df.sort_values(list(resort_dict.keys()))
-    return _df
+def y_values(df: pd.DataFrame, columns: list[str]) -> list[list[float]]:
+    """Combine the y columns of a chart into a list of values for each row
+
+    Values are converted to float64 so that missing values are NaN (serialised as
+    null) regardless of the dtype backend.
+
+    Args:
+        df: DataFrame with the chart data
+        columns: y columns to combine, in order
+
+    Returns:
+        A list with the y values of each row
+    """
+
+    return df[columns].to_numpy(dtype="float64", na_value=float("nan")).tolist()
 
 
 def timeout_30min(func: Callable[..., Any]) -> Callable[..., Any]:
@@ -79,8 +130,6 @@ def add_africa_values(df, agg_operation: "sum") -> pd.DataFrame:
         DataFrame with Africa (excluding high income) aggregate values added.
     """
 
-    dff = df.copy(deep=True)  # make a copy to avoid modifying the original dataframe
-
     afr_dff = (
         df.assign(
             iso3_code=lambda d: places.resolve_places(
@@ -102,18 +151,22 @@ def add_africa_values(df, agg_operation: "sum") -> pd.DataFrame:
         .drop(columns=["income_level", "iso3_code", "continent"])
         .dropna(subset="value")
         .groupby(
-            [
-                i
-                for i in dff.columns
-                if i not in ["value", "entity_name", "entity_code"]
-            ],
+            [i for i in df.columns if i not in ["value", "entity_name", "entity_code"]],
             observed=True,
         )
         .agg({"value": agg_operation})
         .reset_index()
         .assign(entity_name="Africa (excluding high income)", is_aggregate=True)
+        .reindex(columns=list(dict.fromkeys([*df.columns, "is_aggregate"])))
+        # match the Arrow dtypes of the original dataframe so that they are kept
+        .astype(
+            {
+                col: dtype
+                for col, dtype in df.dtypes.items()
+                if isinstance(dtype, pd.ArrowDtype)
+            }
+        )
     )
 
-    dff = pd.concat([dff, afr_dff], ignore_index=True)
-
-    return dff
+    # concat returns a new frame, so the original dataframe is not modified
+    return pd.concat([df, afr_dff], ignore_index=True)
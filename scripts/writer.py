@@ -0,0 +1,198 @@
+"""Output writer for the analysis artifacts."""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from types import TracebackType
+from typing import Any
+
+import pandas as pd
+
+from scripts.config import Paths
+from scripts.logger import logger
+
+MAX_WORKERS = 4
+MANIFEST = "manifest.json"
+
+# mkstemp creates owner-only files, so outputs are given the default file mode.
+# The umask can only be read by setting it, which is done once at import.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+FILE_MODE = 0o666 & ~_UMASK
+
+
+class OutputWriter:
+    """Write the output files of a run on a worker pool and commit them together.
+
+    Files are serialised in the background into a staging folder inside the output
+    folder, each one to a temporary file that is then renamed. When the writer exits
+    without errors, all files are moved into the output folder followed by a manifest
+    listing them. If the run fails, the staging folder is removed and the existing
+    outputs are left untouched.
+
+    Usage:
+        with OutputWriter() as writer:
+            writer.to_csv(df, "chart_1_chart.csv")
+
+    Args:
+        output: Folder where the files are committed. Default is Paths.output
+        max_workers: Number of worker threads. If 0, files are written synchronously
+    """
+
+    def __init__(self, output: Path | None = None, max_workers: int = MAX_WORKERS):
+        self.output = output or Paths.output
+        self.max_workers = max_workers
+        self._staging: Path | None = None
+        self._pool: ThreadPoolExecutor | None = None
+        self._jobs: dict[str, Future[dict[str, Any]]] = {}
+
+    def __enter__(self) -> "OutputWriter":
+        self._staging = Path(tempfile.mkdtemp(prefix=".staging-", dir=self.output))
+        if self.max_workers > 0:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        try:
+            if exc_type is None:
+                self._commit()
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True, cancel_futures=True)
+                self._pool = None
+            if self._staging is not None:
+                shutil.rmtree(self._staging, ignore_errors=True)
+                self._staging = None
+            self._jobs = {}
+
+    @property
+    def staging(self) -> Path:
+        """Staging folder of the current run"""
+
+        if self._staging is None:
+            raise RuntimeError("OutputWriter must be used as a context manager")
+
+        return self._staging
+
+    def submit(self, name: str, serialise: Callable[[Path], None]) -> None:
+        """Queue a file to be written
+
+        Args:
+            name: Name of the file in the output folder
+            serialise: Function that writes the file to the path it is given
+        """
+
+        if self._staging is None:
+            raise RuntimeError("OutputWriter must be used as a context manager")
+
+        if name == MANIFEST:
+            raise ValueError(f"{MANIFEST} is reserved for the run manifest")
+
+        # wait for a previous write of the same file so that the last one wins
+        if name in self._jobs:
+            self._jobs[name].result()
+
+        if self._pool is None:
+            future: Future[dict[str, Any]] = Future()
+            future.set_result(self._write(name, serialise))
+        else:
+            future = self._pool.submit(self._write, name, serialise)
+
+        self._jobs[name] = future
+
+    def to_csv(self, df: pd.DataFrame, name: str) -> None:
+        """Queue a DataFrame to be written as a CSV file without the index"""
+
+        self.submit(name, lambda path: df.to_csv(path, index=False))
+
+    def to_json(self, df: pd.DataFrame, name: str) -> None:
+        """Queue a DataFrame to be written as a JSON file of records"""
+
+        self.submit(
+            name, lambda path: df.to_json(path, orient="records", date_format="iso")
+        )
+
+    def dump_json(self, obj: Any, name: str) -> None:
+        """Queue a JSON serialisable object to be written as a JSON file"""
+
+        def serialise(path: Path) -> None:
+            with open(path, "w") as f:
+                json.dump(obj, f)
+
+        self.submit(name, serialise)
+
+    def read_json(self, name: str) -> Any:
+        """Read a JSON file, waiting for it if it is queued in this run
+
+        Args:
+            name: Name of the file in the output folder
+
+        Returns:
+            The parsed content of the file queued in this run, or of the committed
+            file if it was not written in this run
+        """
+
+        if name in self._jobs:
+            self._jobs[name].result()
+            path = self.staging / name
+        else:
+            path = self.output / name
+
+        with open(path) as f:
+            return json.load(f)
+
+    def _write(self, name: str, serialise: Callable[[Path], None]) -> dict[str, Any]:
+        """Serialise a file to a temporary file and rename it in the staging folder
+
+        Returns:
+            The size and sha256 digest of the file, for the run manifest
+        """
+
+        fd, tmp = tempfile.mkstemp(dir=self.staging, suffix=".tmp")
+        os.close(fd)
+
+        try:
+            serialise(Path(tmp))
+            os.chmod(tmp, FILE_MODE)
+
+            # hash on the worker thread, while the file is still in the page cache
+            with open(tmp, "rb") as f:
+                digest = hashlib.file_digest(f, "sha256").hexdigest()
+
+            info = {"bytes": os.path.getsize(tmp), "sha256": digest}
+            os.replace(tmp, self.staging / name)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+        return info
+
+    def _commit(self) -> None:
+        """Wait for all files and move them with a manifest into the output folder"""
+
+        # raise the first serialisation error before anything is committed
+        files = {name: self._jobs[name].result() for name in sorted(self._jobs)}
+
+        manifest = {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "files": files,
+        }
+        self._write(MANIFEST, lambda path: path.write_text(json.dumps(manifest)))
+
+        # each rename is atomic, the manifest is moved last to mark the run complete
+        for name in self._jobs:
+            os.replace(self.staging / name, self.output / name)
+        os.replace(self.staging / MANIFEST, self.output / MANIFEST)
+
+        logger.info(f"Committed {len(self._jobs)} output files")
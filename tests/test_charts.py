@@ -0,0 +1,276 @@
+"""Tests for the chart and key statistics pipeline on synthetic raw data."""
+
+import json
+from collections.abc import Iterator
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.analysis import charts
+from scripts.analysis.get_raw_data import DEBT_GNI_INDICATOR
+from scripts.config import Paths, Settings
+from scripts.writer import MANIFEST, OutputWriter
+
+ENTITIES = {"LMY": "Low & middle income", "KEN": "Kenya", "GHA": "Ghana"}
+COUNTERPARTS = {"WLD": "World", "CHN": "China"}
+
+STOCK_INDICATORS = [
+    "DT.DOD.BLAT.CD",
+    "DT.DOD.MLAT.CD",
+    "DT.DOD.PBND.CD",
+    "DT.DOD.PCBK.CD",
+    "DT.DOD.PROP.CD",
+]
+SERVICE_INDICATORS = [
+    f"DT.{kind}.{creditor}.CD"
+    for kind in ["AMT", "INT"]
+    for creditor in ["BLAT", "MLAT", "PBND", "PCBK", "PROP"]
+]
+CURRENCY_INDICATORS = [
+    "DT.CUR.USDL.ZS",
+    "DT.CUR.EURO.ZS",
+    "DT.CUR.SDRW.ZS",
+    "DT.CUR.JYEN.ZS",
+    "DT.CUR.UKPS.ZS",
+    "DT.CUR.MULC.ZS",
+]
+
+
+def _ids_data(indicators: list[str], years: range, seed: int) -> pd.DataFrame:
+    """Build IDS-like raw data with a few missing values"""
+
+    rng = np.random.default_rng(seed)
+
+    df = pd.DataFrame(
+        [
+            {
+                "indicator_code": indicator,
+                "indicator_name": f"{indicator} name",
+                "counterpart_code": counterpart_code,
+                "counterpart_name": counterpart_name,
+                "entity_code": entity_code,
+                "entity_name": entity_name,
+                "is_aggregate": entity_code == "LMY",
+                "year": year,
+            }
+            for indicator in indicators
+            for entity_code, entity_name in ENTITIES.items()
+            for counterpart_code, counterpart_name in COUNTERPARTS.items()
+            for year in years
+        ]
+    )
+
+    values = rng.integers(1, 1_000, len(df)) * 1_000_000.0
+    values[rng.random(len(df)) < 0.1] = np.nan
+
+    return df.assign(value=values)
+
+
+def _constant_data(indicators: list[str], years: range, value: float) -> pd.DataFrame:
+    """Build IDS-like raw data with the same value in every row"""
+
+    return _ids_data(indicators, years, 0).assign(value=value)
+
+
+@pytest.fixture
+def key_stats_data(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Write raw data for the last two years and stub the DSA data"""
+
+    raw = tmp_path / "raw_data"
+    raw.mkdir()
+
+    latest = charts.LATEST_YEAR
+    years = range(latest - 1, latest + 1)
+
+    pd.concat(
+        [
+            _constant_data(STOCK_INDICATORS, years, 100_000_000_000.0),
+            _constant_data([DEBT_GNI_INDICATOR], years, 20.123),
+        ],
+        ignore_index=True,
+    ).to_parquet(raw / "ids_debt_stocks.parquet", index=False)
+
+    # projections after the latest year are not part of the key statistics
+    _constant_data(
+        SERVICE_INDICATORS, range(latest - 1, latest + 3), 2_000_000_000.0
+    ).to_parquet(raw / "ids_debt_service.parquet", index=False)
+
+    monkeypatch.setattr(Paths, "raw_data", raw)
+    monkeypatch.setattr(
+        charts,
+        "_get_dsa_data",
+        lambda: pd.DataFrame(
+            {"risk_of_debt_distress": ["High", "In debt distress", "Low", None]}
+        ),
+    )
+
+    return raw
+
+
+@pytest.fixture
+def raw_data(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Write synthetic raw parquet files and point Paths.raw_data to them"""
+
+    raw = tmp_path / "raw_data"
+    raw.mkdir()
+
+    latest = charts.LATEST_YEAR
+    _ids_data(STOCK_INDICATORS, range(latest - 2, latest + 1), 0).to_parquet(
+        raw / "ids_debt_stocks.parquet", index=False
+    )
+    _ids_data(
+        SERVICE_INDICATORS, range(latest - 2, latest + charts.NUM_EST_YEARS + 1), 1
+    ).to_parquet(raw / "ids_debt_service.parquet", index=False)
+    _ids_data(CURRENCY_INDICATORS, range(latest - 2, latest + 1), 2).to_parquet(
+        raw / "ids_currency_composition.parquet", index=False
+    )
+
+    monkeypatch.setattr(Paths, "raw_data", raw)
+
+    return raw
+
+
+@pytest.fixture
+def use_backend(monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    """Run with the pyarrow dtype backend and copy-on-write"""
+
+    monkeypatch.setattr(Settings, "dtype_backend", "pyarrow")
+
+    with pd.option_context("mode.copy_on_write", True):
+        yield
+
+
+@pytest.mark.usefixtures("raw_data", "use_backend")
+def test_debt_service_data_keeps_arrow_dtypes() -> None:
+    """The mapped category and type columns keep the Arrow string dtype"""
+
+    df = charts._get_debt_service_data()
+
+    assert all(isinstance(dtype, pd.ArrowDtype) for dtype in df.dtypes)
+    assert set(df.category) == {
+        "bilateral",
+        "multilateral",
+        "bonds",
+        "commercial banks",
+        "other private",
+    }
+    assert set(df.type) == {"principal", "interest"}
+
+
+@pytest.mark.usefixtures("raw_data")
+def test_debt_service_data_backend_parity(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Both backends give the same debt service data"""
+
+    expected = charts._get_debt_service_data()
+
+    monkeypatch.setattr(Settings, "dtype_backend", "pyarrow")
+    result = charts._get_debt_service_data()
+
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+@pytest.mark.usefixtures("raw_data")
+def test_chart_outputs_backend_parity(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Charts 1 to 4 write identical files on the NumPy and pyarrow backends"""
+
+    outputs = {}
+
+    for backend in ["numpy", "pyarrow"]:
+        monkeypatch.setattr(Settings, "dtype_backend", backend)
+        outputs[backend] = tmp_path / backend
+        outputs[backend].mkdir()
+
+        with (
+            pd.option_context("mode.copy_on_write", backend == "pyarrow"),
+            OutputWriter(outputs[backend]) as writer,
+        ):
+            charts.chart_1(writer)
+            charts.chart_2(writer)
+            charts.chart_3(writer)
+            charts.chart_4(writer)
+
+    files = {
+        backend: sorted(p.name for p in output.iterdir() if p.name != MANIFEST)
+        for backend, output in outputs.items()
+    }
+
+    assert len(files["numpy"]) == 11
+    assert files["pyarrow"] == files["numpy"]
+
+    for name in files["numpy"]:
+        numpy_bytes = (outputs["numpy"] / name).read_bytes()
+        assert (outputs["pyarrow"] / name).read_bytes() == numpy_bytes, name
+
+
+@pytest.mark.usefixtures("key_stats_data")
+def test_key_stats_history(tmp_path: Path) -> None:
+    """The history covers every year and keeps the ratio out of the debt stock"""
+
+    with OutputWriter(tmp_path) as writer:
+        charts.key_stats(writer)
+
+    history = pd.read_csv(tmp_path / "key_stats_history.csv").set_index("year")
+    latest = charts.LATEST_YEAR
+
+    assert history.index.tolist() == list(range(charts.START_YEAR, latest + 1))
+    assert history.loc[: latest - 2].isna().all().all()
+
+    # five stock indicators of US$100 billion, without the debt to GNI ratio
+    assert history.loc[latest, "debt_stock_total"] == 0.5
+    assert history.loc[latest, "debt_gni"] == 20.123
+    assert history.loc[latest, "debt_service_total"] == 20.0
+
+    distress = history.countries_debt_distress
+    assert distress.loc[latest] == 2
+    assert distress.drop(latest).isna().all()
+
+
+@pytest.mark.usefixtures("key_stats_data")
+def test_key_stats_json(tmp_path: Path) -> None:
+    """key_stats.json keeps its keys and formatting"""
+
+    with OutputWriter(tmp_path) as writer:
+        charts.key_stats(writer)
+
+    stats = json.loads((tmp_path / "key_stats.json").read_text())
+
+    assert list(stats) == [
+        "debt_gni",
+        "debt_stock_total",
+        "debt_service_total",
+        "countries_debt_distress",
+        "latest_year",
+    ]
+    assert stats == {
+        "debt_gni": "20.12%",
+        "debt_stock_total": "US$0.5 trillion",
+        "debt_service_total": "US$20.0 billion",
+        "countries_debt_distress": 2,
+        "latest_year": charts.LATEST_YEAR,
+    }
+
+
+def test_key_stats_missing_latest_metric(tmp_path: Path, key_stats_data: Path) -> None:
+    """A missing latest year metric raises and nothing is committed"""
+
+    path = key_stats_data / "ids_debt_stocks.parquet"
+    pd.read_parquet(path).loc[
+        lambda d: (
+            ~((d.indicator_code == DEBT_GNI_INDICATOR) & (d.year == charts.LATEST_YEAR))
+        )
+    ].to_parquet(path, index=False)
+
+    output = tmp_path / "output"
+    output.mkdir()
+
+    with (
+        pytest.raises(ValueError, match=r"Missing key statistics.*debt_gni"),
+        OutputWriter(output) as writer,
+    ):
+        charts.key_stats(writer)
+
+    assert list(output.iterdir()) == []
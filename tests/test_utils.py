@@ -0,0 +1,208 @@
+"""Tests for the utility functions on the NumPy and pyarrow backends."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts import utils
+
+PLACES = {
+    "iso3_code": {"Kenya": "KEN", "Ghana": "GHA", "Mauritius": "MUS", "France": "FRA"},
+    "region": {"KEN": "Africa", "GHA": "Africa", "MUS": "Africa", "FRA": "Europe"},
+    "income_level": {
+        "KEN": "Lower middle income",
+        "GHA": "Lower middle income",
+        "MUS": "High income",
+        "FRA": "High income",
+    },
+}
+
+
+def _to_backend(df: pd.DataFrame, backend: str) -> pd.DataFrame:
+    """Convert a DataFrame to the given dtype backend"""
+
+    if backend == "pyarrow":
+        return df.convert_dtypes(dtype_backend="pyarrow")
+
+    return df
+
+
+def _is_arrow(df: pd.DataFrame) -> bool:
+    """Check if all the columns of a DataFrame are Arrow backed"""
+
+    return all(isinstance(dtype, pd.ArrowDtype) for dtype in df.dtypes)
+
+
+def _old_custom_sort(
+    df: pd.DataFrame, resort_dict: dict[str, list[str] | str]
+) -> pd.DataFrame:
+    """Categorical implementation of custom_sort used before the pyarrow backend"""
+
+    _df = df.copy(deep=True)
+
+    for col, items in resort_dict.items():
+        values = [items] if isinstance(items, str) else items
+        _df[col] = pd.Categorical(
+            _df[col],
+            categories=values
+            + sorted(val for val in _df[col].unique() if val not in values),
+            ordered=True,
+        )
+
+    return _df.sort_values(list(resort_dict.keys()))
+
+
+@pytest.fixture
+def chart_df() -> pd.DataFrame:
+    """Chart data with unique debtor/creditor pairs in shuffled order"""
+
+    debtors = ["Kenya", "Low & middle income", "Angola", "Zambia", "Ghana"]
+    creditors = ["China", "All creditors", "Bondholders"]
+
+    return (
+        pd.DataFrame(
+            [(d, c) for d in debtors for c in creditors],
+            columns=["debtor_name", "creditor_name"],
+        )
+        .assign(value=lambda d: np.arange(len(d), dtype="float64"))
+        .sample(frac=1, random_state=1)
+    )
+
+
+@pytest.fixture
+def ids_df() -> pd.DataFrame:
+    """Country level debt data, including a high income African country"""
+
+    return pd.DataFrame(
+        {
+            "entity_name": ["Kenya", "Ghana", "Mauritius", "France", "Kenya", "Ghana"],
+            "entity_code": ["KEN", "GHA", "MUS", "FRA", "KEN", "GHA"],
+            "indicator_code": ["DT.DOD.BLAT.CD"] * 4 + ["DT.DOD.MLAT.CD"] * 2,
+            "year": [2024] * 6,
+            "value": [1.0, 2.0, 4.0, 8.0, 16.0, np.nan],
+            "is_aggregate": [False] * 6,
+        }
+    )
+
+
+@pytest.fixture
+def fake_places(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Resolve places from a fixed table instead of the remote service"""
+
+    def resolve_places(values: pd.Series, to_type: str, **kwargs: object) -> pd.Series:
+        return values.map(PLACES[to_type])
+
+    monkeypatch.setattr(utils.places, "resolve_places", resolve_places)
+
+
+def test_custom_sort_matches_categorical_sort(chart_df: pd.DataFrame) -> None:
+    """Without ties the order is the same as the previous Categorical sort"""
+
+    resort = {"debtor_name": "Low & middle income", "creditor_name": "All creditors"}
+
+    result = utils.custom_sort(chart_df, dict(resort))
+    expected = _old_custom_sort(chart_df, dict(resort))
+
+    assert result.index.tolist() == expected.index.tolist()
+    assert result.iloc[0].tolist() == ["Low & middle income", "All creditors", 4.0]
+
+
+def test_custom_sort_does_not_modify_inputs(chart_df: pd.DataFrame) -> None:
+    """The passed DataFrame and dictionary are left unchanged"""
+
+    original = chart_df.copy()
+    resort = {"debtor_name": "Low & middle income"}
+
+    utils.custom_sort(chart_df, resort)
+
+    pd.testing.assert_frame_equal(chart_df, original)
+    assert resort == {"debtor_name": "Low & middle income"}
+
+
+def test_custom_sort_missing_column(chart_df: pd.DataFrame) -> None:
+    """An unknown column raises a ValueError"""
+
+    with pytest.raises(ValueError, match="Column not found"):
+        utils.custom_sort(chart_df, {"entity_name": "Low & middle income"})
+
+
+def test_custom_sort_backend_parity(chart_df: pd.DataFrame) -> None:
+    """Both backends give the same values and pyarrow keeps Arrow dtypes"""
+
+    resort = {"debtor_name": "Low & middle income", "creditor_name": "All creditors"}
+
+    expected = utils.custom_sort(chart_df, resort)
+    result = utils.custom_sort(_to_backend(chart_df, "pyarrow"), resort)
+
+    assert _is_arrow(result)
+    pd.testing.assert_frame_equal(result, _to_backend(expected, "pyarrow"))
+
+
+@pytest.mark.usefixtures("fake_places")
+def test_add_africa_values_backend_parity(ids_df: pd.DataFrame) -> None:
+    """Both backends give the same values and pyarrow keeps Arrow dtypes"""
+
+    expected = utils.add_africa_values(ids_df, agg_operation="sum")
+    result = utils.add_africa_values(
+        _to_backend(ids_df, "pyarrow"), agg_operation="sum"
+    )
+
+    africa = expected.loc[lambda d: d.entity_name == "Africa (excluding high income)"]
+    assert africa.set_index("indicator_code").value.to_dict() == {
+        "DT.DOD.BLAT.CD": 3.0,
+        "DT.DOD.MLAT.CD": 16.0,
+    }
+
+    assert _is_arrow(result)
+    pd.testing.assert_frame_equal(result, _to_backend(expected, "pyarrow"))
+
+
+@pytest.mark.usefixtures("fake_places")
+@pytest.mark.parametrize("backend", ["numpy", "pyarrow"])
+def test_add_africa_values_without_is_aggregate(
+    ids_df: pd.DataFrame, backend: str
+) -> None:
+    """The Africa rows are flagged as aggregates even without an is_aggregate column"""
+
+    df = _to_backend(ids_df.drop(columns="is_aggregate"), backend)
+
+    result = utils.add_africa_values(df, agg_operation="sum")
+
+    assert "is_aggregate" in result.columns
+    africa = result.loc[lambda d: d.entity_name == "Africa (excluding high income)"]
+    assert len(africa) == 2
+    assert africa.is_aggregate.eq(True).all()
+
+
+@pytest.mark.usefixtures("fake_places")
+def test_add_africa_values_category_entity_name(ids_df: pd.DataFrame) -> None:
+    """A category entity_name keeps the Africa label"""
+
+    df = ids_df.astype({"entity_name": "category"})
+
+    result = utils.add_africa_values(df, agg_operation="sum")
+
+    assert result.entity_name.notna().all()
+    assert (result.entity_name == "Africa (excluding high income)").sum() == 2
+
+
+def test_y_values_nulls_backend_parity() -> None:
+    """Missing y values serialise to null on both backends"""
+
+    df = pd.DataFrame(
+        {"x_values": [2023, 2024], "y1": [1.5, np.nan], "y2": [np.nan, 2]}
+    )
+
+    jsons = [
+        _to_backend(df, backend)
+        .assign(y_values=lambda d: utils.y_values(d, ["y1", "y2"]))
+        .loc[:, ["x_values", "y_values"]]
+        .to_json(orient="records")
+        for backend in ["numpy", "pyarrow"]
+    ]
+
+    assert jsons[0] == jsons[1]
+    assert jsons[0] == (
+        '[{"x_values":2023,"y_values":[1.5,null]},'
+        '{"x_values":2024,"y_values":[null,2.0]}]'
+    )
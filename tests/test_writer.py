@@ -0,0 +1,68 @@
+"""Tests for the output writer."""
+
+import hashlib
+import json
+import os
+import stat
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from scripts.writer import FILE_MODE, MANIFEST, OutputWriter
+
+
+def test_outputs_are_committed_with_default_file_mode(tmp_path: Path) -> None:
+    """Committed files respect the umask instead of the owner-only mkstemp mode"""
+
+    with OutputWriter(tmp_path) as writer:
+        writer.to_csv(pd.DataFrame({"a": [1, 2]}), "chart.csv")
+
+    for name in ["chart.csv", MANIFEST]:
+        assert stat.S_IMODE(os.stat(tmp_path / name).st_mode) == FILE_MODE
+
+
+def test_writes_outside_context_manager_raise(tmp_path: Path) -> None:
+    """Files can't be written without entering the writer"""
+
+    writer = OutputWriter(tmp_path)
+
+    with pytest.raises(RuntimeError, match="context manager"):
+        writer.to_csv(pd.DataFrame({"a": [1]}), "chart.csv")
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_failed_run_leaves_outputs_untouched(tmp_path: Path) -> None:
+    """Nothing is committed and the staging folder is removed if the run fails"""
+
+    (tmp_path / "chart.csv").write_text("old")
+
+    def serialise(path: Path) -> None:
+        raise OSError("disk full")
+
+    with pytest.raises(OSError, match="disk full"), OutputWriter(tmp_path) as writer:
+        writer.to_csv(pd.DataFrame({"a": [1]}), "chart.csv")
+        writer.submit("broken.csv", serialise)
+
+    assert [p.name for p in tmp_path.iterdir()] == ["chart.csv"]
+    assert (tmp_path / "chart.csv").read_text() == "old"
+
+
+@pytest.mark.parametrize("max_workers", [0, 2])
+def test_manifest_lists_committed_files(tmp_path: Path, max_workers: int) -> None:
+    """The manifest records the size and digest of every committed file"""
+
+    with OutputWriter(tmp_path, max_workers=max_workers) as writer:
+        writer.to_csv(pd.DataFrame({"a": [1, 2]}), "chart.csv")
+        writer.dump_json({"latest_year": 2024}, "key_stats.json")
+
+    manifest = json.loads((tmp_path / MANIFEST).read_text())
+
+    assert sorted(manifest["files"]) == ["chart.csv", "key_stats.json"]
+    for name, info in manifest["files"].items():
+        content = (tmp_path / name).read_bytes()
+        assert info == {
+            "bytes": len(content),
+            "sha256": hashlib.sha256(content).hexdigest(),
+        }